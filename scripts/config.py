@@ -14,6 +14,8 @@ METADATA_DIR: str = "metadata"
 """Subdirectory containing metadata files (e.g., labels.csv)."""
 LABELS_FILE: str = "labels.csv"
 """Filename for the main label CSV."""
+MANIFEST_FILE: str = "manifest.csv"
+"""Filename for the CSV mapping each patient_id to its row in the image stacks."""
 
 # -------------------- Image Specifications --------------------
 IMAGE_RESOLUTIONS: Dict[str, Tuple[int, int]] = {
@@ -22,6 +24,8 @@ IMAGE_RESOLUTIONS: Dict[str, Tuple[int, int]] = {
     "Ultrasound": (224, 224)
 }
 """Spatial resolution (height, width) for each modality."""
+ANATOMY_RESOLUTION: Tuple[int, int] = IMAGE_RESOLUTIONS["MRI"]
+"""Resolution in which the patient anatomy (liver position, size, rotation) is sampled for every modality."""
 
 # -------------------- Dataset Size --------------------
 NUM_PATIENTS: int = 1000
@@ -48,5 +52,15 @@ BINARY_LABEL_MAPPING: Dict[str, List[str]] = {
 # -------------------- File Format Settings --------------------
 IMAGE_FILE_EXTENSION: str = ".npy"
 """File extension for saved images (numpy binary format)."""
+STACK_IMAGES: bool = True
+"""Store each modality as one (num_patients, height, width) .npy stack instead of one file per image."""
+
+# -------------------- Image Cache --------------------
+IMAGE_CACHE_DIR: str = os.environ.get("OMMLCD_CACHE_DIR", ".ommlcd_cache")
+"""Directory of the on-disk cache of generated images, reused across dataset regenerations."""
+IMAGE_CACHE_MB: int = int(os.environ.get("OMMLCD_CACHE_MB", "0"))
+"""Size budget of the image cache in megabytes (least recently used images evicted first); 0 disables it."""
+IMAGE_CACHE_VERSION: str = "v1"
+"""Version of the image generators, part of every cache key (with the NumPy version). Bump it whenever generated images change."""
 METADATA_FILE_FORMAT: str = "csv"
 """Format of the metadata file (CSV)."""
\ No newline at end of file
@@ -1,9 +1,10 @@
 import os
+import numpy as np
 import pandas as pd
 from typing import Dict, List, Optional
 
 from config import DATASET_ROOT, METADATA_DIR, LABELS_FILE, SPLIT_RATIOS
-from utils import ensure_directory
+from utils import ensure_directory, save_labels
 
 
 def load_labels(labels_path: str) -> pd.DataFrame:
@@ -19,33 +20,59 @@ def load_labels(labels_path: str) -> pd.DataFrame:
     return pd.read_csv(labels_path)
 
 
-def get_split_indices(labels_df: pd.DataFrame, split_name: str) -> List[str]:
+def build_split_index(labels_df: pd.DataFrame) -> Dict[str, np.ndarray]:
+    """
+    Map each split name to the row positions of its patients, in a single pass.
+
+    Build it once and pass it to get_split_indices / get_split_dataframe to avoid
+    re-scanning the 'split' column on every call.
+
+    Args:
+        labels_df: DataFrame with a 'split' column.
+
+    Returns:
+        Dictionary mapping split names to arrays of row positions.
+    """
+    return labels_df.groupby("split", sort=False, observed=True).indices
+
+
+def get_split_indices(labels_df: pd.DataFrame, split_name: str,
+                      split_index: Optional[Dict[str, np.ndarray]] = None) -> List[str]:
     """
     Get all patient IDs belonging to a specific split.
 
     Args:
         labels_df: DataFrame with a 'split' column.
         split_name: One of 'train', 'val', 'test'.
+        split_index: Optional index from build_split_index, to skip scanning the 'split' column.
 
     Returns:
         List of patient_id strings for that split.
     """
     if split_name not in SPLIT_RATIOS.keys():
         raise ValueError(f"Split name must be one of {list(SPLIT_RATIOS.keys())}, got '{split_name}'")
-    return labels_df[labels_df["split"] == split_name]["patient_id"].tolist()
+    if split_index is not None:
+        rows = split_index.get(split_name, np.empty(0, dtype=np.intp))
+        return labels_df["patient_id"].iloc[rows].tolist()
+    return labels_df.loc[labels_df["split"] == split_name, "patient_id"].tolist()
 
 
-def get_split_dataframe(labels_df: pd.DataFrame, split_name: str) -> pd.DataFrame:
+def get_split_dataframe(labels_df: pd.DataFrame, split_name: str,
+                        split_index: Optional[Dict[str, np.ndarray]] = None) -> pd.DataFrame:
     """
     Get a DataFrame subset for a specific split.
 
     Args:
         labels_df: Full labels DataFrame.
         split_name: Split name.
+        split_index: Optional index from build_split_index, to skip scanning the 'split' column.
 
     Returns:
         DataFrame containing only rows for that split.
     """
+    if split_index is not None:
+        rows = split_index.get(split_name, np.empty(0, dtype=np.intp))
+        return labels_df.iloc[rows].copy()
     return labels_df[labels_df["split"] == split_name].copy()
 
 
@@ -59,10 +86,13 @@ def write_split_csvs(labels_df: pd.DataFrame, output_dir: str, prefix: str = "")
         prefix: Optional prefix for filenames (e.g., "labels_").
     """
     ensure_directory(output_dir)
+    # Single pass over the data: each group is one split's partition
+    groups = dict(iter(labels_df.groupby("split", sort=False, observed=True)))
+    # Every split gets a file (header only if empty), so no stale file from a previous run survives
     for split in SPLIT_RATIOS.keys():
-        split_df = get_split_dataframe(labels_df, split)
+        split_df = groups.get(split, labels_df.iloc[0:0])
         output_path = os.path.join(output_dir, f"{prefix}{split}.csv")
-        split_df.to_csv(output_path, index=False)
+        save_labels(split_df, output_path)
         print(f"Saved {len(split_df)} records to {output_path}")
 
 
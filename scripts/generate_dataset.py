@@ -1,6 +1,7 @@
 import os
 import sys
-from typing import Dict, List
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional
 
 # Add project root to path to allow imports from scripts
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -14,19 +15,36 @@ from scripts.config import (
     IMAGES_DIR,
     METADATA_DIR,
     LABELS_FILE,
+    MANIFEST_FILE,
     IMAGE_RESOLUTIONS,
+    ANATOMY_RESOLUTION,
     NUM_PATIENTS,
-    IMAGE_FILE_EXTENSION
+    IMAGE_FILE_EXTENSION,
+    STACK_IMAGES,
+    IMAGE_CACHE_DIR,
+    IMAGE_CACHE_MB,
+    IMAGE_CACHE_VERSION
 )
 from scripts.utils import (
     set_global_seed,
     ensure_directory,
     get_image_filename,
+    get_image_filenames,
     get_image_path,
-    save_image
+    get_stack_path,
+    save_image,
+    save_labels,
+    load_image,
+    create_image_stack,
+    load_image_stack,
+    get_image_cache_key,
+    touch_cached_image,
+    link_or_copy,
+    evict_image_cache
 )
 from scripts.labels_generator import generate_all_labels
 from scripts.image_generators import (
+    get_patient_mask,
     generate_mri_image,
     generate_ct_image,
     generate_ultrasound_image
@@ -34,10 +52,141 @@ from scripts.image_generators import (
 from scripts.dataset_splitter import write_split_csvs, verify_split_distribution
 
 
+# Image stacks memory-mapped by this process, keyed by file path
+_open_stacks: Dict[str, np.ndarray] = {}
+
+# Background writers for the one-file-per-image layout: the next modality is generated
+# while the previous one is saved (threads only start on first use, i.e. in the workers)
+_io_pool = ThreadPoolExecutor(max_workers=2)
+
+
+def _get_open_stack(stack_path: str) -> np.ndarray:
+    """
+    Memory-map an image stack for writing, once per process.
+
+    Args:
+        stack_path: Path to the stack .npy file.
+
+    Returns:
+        Writable memory-mapped stack.
+    """
+    if stack_path not in _open_stacks:
+        _open_stacks[stack_path] = load_image_stack(stack_path, mode="r+")
+    return _open_stacks[stack_path]
+
+
+def _store_image(img: np.ndarray, img_path: Optional[str], cache_path: Optional[str]) -> None:
+    """
+    Save a generated image to the cache and/or to its own output file.
+
+    With both paths, the output file is linked to the cached copy instead of written twice.
+
+    Args:
+        img: Generated image.
+        img_path: Output file path, or None when the image goes into a stack.
+        cache_path: Cache file path, or None when caching is disabled.
+    """
+    if cache_path is not None:
+        save_image(img, cache_path)
+        if img_path is not None:
+            link_or_copy(cache_path, img_path)
+    elif img_path is not None:
+        save_image(img, img_path)
+
+
+def generate_one_patient(patient_index: int, patient_id: str, fibrosis_stage: str, base_dir: str,
+                         stack_images: bool = STACK_IMAGES, cache_dir: Optional[str] = None,
+                         image_filenames: Optional[List[str]] = None) -> int:
+    """
+    Generate and save the images of every modality for a single patient.
+
+    Runs in a worker process: all randomness is seeded from the patient ID, so the
+    result does not depend on which worker handles the patient or in which order.
+
+    Args:
+        patient_index: Row of the patient in the image stacks.
+        patient_id: Patient identifier.
+        fibrosis_stage: One of F0-F4.
+        base_dir: Root dataset directory.
+        stack_images: Write into the per-modality stacks (already created) instead of one file per image.
+        cache_dir: Image cache directory to reuse previously generated images from (None disables it).
+        image_filenames: Output filenames in IMAGE_RESOLUTIONS order, for the one-file-per-image layout
+            (built from the patient ID if omitted).
+
+    Returns:
+        Number of images served from the cache.
+    """
+    images_path = os.path.join(base_dir, IMAGES_DIR)
+    pending_writes: List[Future] = []
+    cache_hits = 0
+
+    # Liver mask depends only on anatomy and resolution: build it once per resolution
+    masks = {}
+
+    for modality_index, (modality, resolution) in enumerate(IMAGE_RESOLUTIONS.items()):
+        img_path = None
+        if not stack_images:
+            if image_filenames is not None:
+                img_filename = image_filenames[modality_index]
+            else:
+                img_filename = get_image_filename(patient_id, modality, IMAGE_FILE_EXTENSION)
+            img_path = os.path.join(images_path, img_filename)
+
+        cache_path = None
+        if cache_dir is not None:
+            cache_key = get_image_cache_key(patient_id, modality, fibrosis_stage, resolution, ANATOMY_RESOLUTION,
+                                            IMAGE_CACHE_VERSION)
+            cache_path = os.path.join(cache_dir, f"{cache_key}{IMAGE_FILE_EXTENSION}")
+
+        if cache_path is not None and os.path.exists(cache_path):
+            # Unchanged image: reuse the cached copy instead of regenerating it
+            touch_cached_image(cache_path)
+            if stack_images:
+                stack = _get_open_stack(get_stack_path(modality, base_dir, IMAGES_DIR, IMAGE_FILE_EXTENSION))
+                stack[patient_index] = load_image(cache_path)
+            else:
+                link_or_copy(cache_path, img_path)
+            cache_hits += 1
+            continue
+
+        if resolution not in masks:
+            masks[resolution] = get_patient_mask(patient_id, resolution)
+        mask = masks[resolution]
+
+        # Choose the correct generator function
+        if modality == "MRI":
+            img = generate_mri_image(patient_id, fibrosis_stage, resolution, mask)
+        elif modality == "CT":
+            img = generate_ct_image(patient_id, fibrosis_stage, resolution, mask)
+        elif modality == "Ultrasound":
+            img = generate_ultrasound_image(patient_id, fibrosis_stage, resolution, mask)
+        else:
+            raise ValueError(f"Unknown modality: {modality}")
+
+        if stack_images:
+            # Write this patient's slice of the modality stack
+            stack = _get_open_stack(get_stack_path(modality, base_dir, IMAGES_DIR, IMAGE_FILE_EXTENSION))
+            stack[patient_index] = img
+
+        # Save in the background (each write targets its own file)
+        if img_path is not None or cache_path is not None:
+            pending_writes.append(_io_pool.submit(_store_image, img, img_path, cache_path))
+
+    # Wait for this patient's files before reporting it as done
+    for write in pending_writes:
+        write.result()
+
+    return cache_hits
+
+
 def generate_dataset(
     num_patients: int = NUM_PATIENTS,
     seed: int = RANDOM_SEED,
-    base_dir: str = DATASET_ROOT
+    base_dir: str = DATASET_ROOT,
+    num_workers: Optional[int] = None,
+    stack_images: bool = STACK_IMAGES,
+    cache_mb: int = IMAGE_CACHE_MB,
+    cache_dir: str = IMAGE_CACHE_DIR
 ) -> None:
     """
     Main function to generate the entire synthetic dataset.
@@ -47,9 +196,18 @@ def generate_dataset(
         2. Create directory structure.
         3. Generate labels and metadata for all patients.
         4. Save labels to CSV.
-        5. Generate images for each patient and each modality.
+        5. Generate images for each patient and each modality, in parallel over patients.
         6. Write split-specific CSV files.
         7. Print summary.
+
+    Args:
+        num_patients: Total number of patients.
+        seed: Random seed for reproducibility.
+        base_dir: Root dataset directory.
+        num_workers: Number of worker processes for image generation (defaults to os.cpu_count()).
+        stack_images: Store each modality as one memory-mapped (N, H, W) stack instead of one file per image.
+        cache_mb: Size budget of the on-disk image cache in megabytes; 0 disables the cache.
+        cache_dir: Directory of the on-disk image cache.
     """
     # Step 1: Set seed
     set_global_seed(seed)
@@ -68,42 +226,59 @@ def generate_dataset(
 
     # Step 4: Save labels CSV
     labels_csv_path = os.path.join(metadata_path, LABELS_FILE)
-    labels_df.to_csv(labels_csv_path, index=False)
+    save_labels(labels_df, labels_csv_path)
     print(f"Labels saved to {labels_csv_path}")
 
     # Step 5: Generate images
     print("Generating images for all patients and modalities...")
     modalities = list(IMAGE_RESOLUTIONS.keys())
     total_images = num_patients * len(modalities)
-    count = 0
-
-    for idx, row in labels_df.iterrows():
-        patient_id = row["patient_id"]
-        fibrosis_stage = row["fibrosis_stage"]
-
-        for modality in modalities:
-            resolution = IMAGE_RESOLUTIONS[modality]
-
-            # Choose the correct generator function
-            if modality == "MRI":
-                img = generate_mri_image(patient_id, fibrosis_stage, resolution)
-            elif modality == "CT":
-                img = generate_ct_image(patient_id, fibrosis_stage, resolution)
-            elif modality == "Ultrasound":
-                img = generate_ultrasound_image(patient_id, fibrosis_stage, resolution)
-            else:
-                raise ValueError(f"Unknown modality: {modality}")
+    num_workers = num_workers or os.cpu_count()
 
-            # Construct full path and save
-            img_filename = get_image_filename(patient_id, modality, IMAGE_FILE_EXTENSION)
-            img_path = os.path.join(images_path, img_filename)
-            save_image(img, img_path)
+    if stack_images:
+        # Pre-allocate one stack per modality; workers fill their patient's slice in place
+        for modality, resolution in IMAGE_RESOLUTIONS.items():
+            stack_path = get_stack_path(modality, base_dir, IMAGES_DIR, IMAGE_FILE_EXTENSION)
+            stack = create_image_stack(stack_path, num_patients, resolution)
+            del stack  # Flush the header and close before workers map the file
+        manifest_path = os.path.join(metadata_path, MANIFEST_FILE)
+        manifest_df = pd.DataFrame({"patient_id": labels_df["patient_id"], "stack_index": np.arange(num_patients)})
+        save_labels(manifest_df, manifest_path)
+        print(f"Manifest saved to {manifest_path}")
+
+    # Plain tuples from whole columns: no per-row boxing, and small per-task pickling cost
+    patient_ids = labels_df["patient_id"].to_numpy()
+    fibrosis_stages = labels_df["fibrosis_stage"].to_numpy()
+    records = list(zip(patient_ids, fibrosis_stages))
+
+    # Output filenames of every (patient, modality), built once instead of formatted per image
+    filename_table = None
+    if not stack_images:
+        filename_table = get_image_filenames(patient_ids, modalities, IMAGE_FILE_EXTENSION).tolist()
+
+    # On-disk cache of generated images, reused across regenerations
+    worker_cache_dir = None
+    if cache_mb > 0:
+        ensure_directory(cache_dir)
+        worker_cache_dir = cache_dir
 
-            count += 1
-            if count % 100 == 0:
-                print(f"  Progress: {count}/{total_images} images saved")
+    cache_hits = 0
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        futures = [
+            executor.submit(generate_one_patient, patient_index, patient_id, fibrosis_stage, base_dir,
+                            stack_images, worker_cache_dir,
+                            filename_table[patient_index] if filename_table is not None else None)
+            for patient_index, (patient_id, fibrosis_stage) in enumerate(records)
+        ]
+        for done, future in enumerate(as_completed(futures), start=1):
+            cache_hits += future.result()  # Re-raise any error from the worker
+            if done % 100 == 0:
+                print(f"  Progress: {done * len(modalities)}/{total_images} images saved")
 
     print(f"All {total_images} images saved successfully.")
+    if worker_cache_dir is not None:
+        evicted = evict_image_cache(worker_cache_dir, cache_mb * 1024 * 1024)
+        print(f"Image cache: {cache_hits}/{total_images} images reused, {evicted} evicted from {worker_cache_dir}")
 
     # Step 6: Write split-specific CSV files
     print("Writing split CSV files...")
@@ -1,40 +1,47 @@
+import functools
+import zlib
 import numpy as np
-import hashlib
-from typing import Tuple, Dict, Any
+from typing import Tuple, Dict, Any, Optional
 
-from config import IMAGE_RESOLUTIONS, FIBROSIS_STAGES, RANDOM_SEED
+from config import IMAGE_RESOLUTIONS, ANATOMY_RESOLUTION, FIBROSIS_STAGES, RANDOM_SEED
 from utils import get_patient_id  # though not directly used here, may be for consistency
 
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:  # Numba is optional: fall back to the NumPy implementation
+    NUMBA_AVAILABLE = False
+
 
 # -------------------- Helper: Deterministic Patient Anatomy --------------------
-def _get_patient_anatomy_params(patient_id: str, modality: str) -> Dict[str, Any]:
+@functools.lru_cache(maxsize=64)
+def _sample_patient_anatomy(patient_id: str) -> Tuple[Tuple[int, int], Tuple[int, int], float, float, Dict[str, Any]]:
     """
-    Generate deterministic anatomical parameters for a patient, consistent across modalities.
+    Sample the anatomy of a patient once; every modality of that patient reuses the result.
 
     Args:
         patient_id: Patient identifier string.
-        modality: Modality name (used to seed differently if needed, but anatomy should be same).
 
     Returns:
-        Dictionary with keys: 'liver_center', 'liver_axes', 'rotation_angle', 'liver_intensity_base'.
+        Tuple (center, axes, angle, intensity_base, rng_state), where rng_state is the
+        generator state right after the anatomy draws.
     """
-    # Create a seed from patient_id (hash to integer)
+    # Create a seed from patient_id (cheap 32-bit hash)
     seed_str = f"{patient_id}_anatomy"
-    seed = int(hashlib.sha256(seed_str.encode()).hexdigest(), 16) % (2 ** 32)
-    rng = np.random.RandomState(seed)
+    seed = zlib.crc32(seed_str.encode()) & 0xFFFFFFFF
+    rng = np.random.default_rng(seed)
 
     # Resolution from config (use MRI for anatomy, but shape independent)
-    res = IMAGE_RESOLUTIONS["MRI"]  # Use MRI resolution for anatomical dimensions
-    h, w = res
+    h, w = ANATOMY_RESOLUTION  # MRI resolution is used for anatomical dimensions
 
     # Liver region: an ellipse with random center near image center, random axes
-    center_x = int(w * (0.4 + 0.2 * rng.rand()))  # between 0.4w and 0.6w
-    center_y = int(h * (0.4 + 0.2 * rng.rand()))  # between 0.4h and 0.6h
+    center_x = int(w * (0.4 + 0.2 * rng.random()))  # between 0.4w and 0.6w
+    center_y = int(h * (0.4 + 0.2 * rng.random()))  # between 0.4h and 0.6h
     liver_center = (center_y, center_x)  # (row, col)
 
     # Axes lengths (semi-major and semi-minor) as fractions of image size
-    axis_major = int(min(h, w) * (0.2 + 0.1 * rng.rand()))  # 20-30% of smaller dimension
-    axis_minor = int(axis_major * (0.6 + 0.3 * rng.rand()))  # 60-90% of major
+    axis_major = int(min(h, w) * (0.2 + 0.1 * rng.random()))  # 20-30% of smaller dimension
+    axis_minor = int(axis_major * (0.6 + 0.3 * rng.random()))  # 60-90% of major
     liver_axes = (axis_major, axis_minor)
 
     # Rotation angle in degrees
@@ -44,6 +51,26 @@ def _get_patient_anatomy_params(patient_id: str, modality: str) -> Dict[str, Any
     # But we keep it here for potential cross-modality consistency
     liver_intensity_base = rng.uniform(0.5, 0.8)  # normalized intensity
 
+    return liver_center, liver_axes, rotation_angle, liver_intensity_base, rng.bit_generator.state
+
+
+def _get_patient_anatomy_params(patient_id: str, modality: str) -> Dict[str, Any]:
+    """
+    Generate deterministic anatomical parameters for a patient, consistent across modalities.
+
+    Args:
+        patient_id: Patient identifier string.
+        modality: Modality name (used to seed differently if needed, but anatomy should be same).
+
+    Returns:
+        Dictionary with keys: 'center', 'axes', 'angle', 'intensity_base', 'rng'.
+    """
+    liver_center, liver_axes, rotation_angle, liver_intensity_base, rng_state = _sample_patient_anatomy(patient_id)
+
+    # Fresh generator resumed right after the anatomy draws, as if it had just sampled them
+    rng = np.random.Generator(np.random.PCG64())
+    rng.bit_generator.state = rng_state
+
     return {
         "center": liver_center,
         "axes": liver_axes,
@@ -54,6 +81,21 @@ def _get_patient_anatomy_params(patient_id: str, modality: str) -> Dict[str, Any
 
 
 # -------------------- Helper: Create Elliptical Mask --------------------
+@functools.lru_cache(maxsize=8)
+def _ogrid(h: int, w: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Open coordinate grids for an image shape, shared across all masks of that shape.
+
+    Args:
+        h: Image height.
+        w: Image width.
+
+    Returns:
+        Tuple (y, x) of broadcastable row and column index arrays. Treat as read-only.
+    """
+    return np.ogrid[:h, :w]
+
+
 def _create_elliptical_mask(shape: Tuple[int, int], center: Tuple[int, int], axes: Tuple[int, int],
                             angle: float) -> np.ndarray:
     """
@@ -69,24 +111,254 @@ def _create_elliptical_mask(shape: Tuple[int, int], center: Tuple[int, int], axe
         2D boolean mask.
     """
     h, w = shape
-    y, x = np.ogrid[:h, :w]
-    y_centered = y - center[0]
-    x_centered = x - center[1]
 
-    # Rotate coordinates
+    # Every pixel inside the ellipse lies within max(axes) of the center: only evaluate that window
+    radius = max(axes)
+    y0, y1 = min(max(center[0] - radius, 0), h), min(max(center[0] + radius + 1, 0), h)
+    x0, x1 = min(max(center[1] - radius, 0), w), min(max(center[1] + radius + 1, 0), w)
+    y, x = _ogrid(h, w)
+    y_centered = (y[y0:y1] - center[0]).astype(np.float32)
+    x_centered = (x[:, x0:x1] - center[1]).astype(np.float32)
+
+    # Rotate coordinates (float32: pixels lying right on the boundary can differ from a float64 evaluation)
     theta = np.radians(angle)
-    cos_t = np.cos(theta)
-    sin_t = np.sin(theta)
+    cos_t = np.float32(np.cos(theta))
+    sin_t = np.float32(np.sin(theta))
     x_rot = x_centered * cos_t - y_centered * sin_t
     y_rot = x_centered * sin_t + y_centered * cos_t
 
-    # Ellipse equation
-    mask = (x_rot ** 2 / axes[1] ** 2 + y_rot ** 2 / axes[0] ** 2) <= 1
+    # Ellipse equation, with the divisions hoisted out of the per-pixel arithmetic
+    inv_a2 = np.float32(1.0 / axes[0] ** 2)
+    inv_b2 = np.float32(1.0 / axes[1] ** 2)
+    mask = np.zeros((h, w), dtype=bool)
+    mask[y0:y1, x0:x1] = (x_rot * x_rot) * inv_b2 + (y_rot * y_rot) * inv_a2 <= 1
     return mask
 
 
+def _mask_bbox(mask: np.ndarray) -> Tuple[slice, slice]:
+    """
+    Bounding box of the set pixels of a mask.
+
+    Args:
+        mask: 2D boolean mask.
+
+    Returns:
+        Tuple (rows, cols) of slices; both are empty if the mask has no set pixel.
+    """
+    rows = np.flatnonzero(mask.any(axis=1))
+    cols = np.flatnonzero(mask.any(axis=0))
+    if rows.size == 0:
+        return slice(0, 0), slice(0, 0)
+    return slice(rows[0], rows[-1] + 1), slice(cols[0], cols[-1] + 1)
+
+
+def _stamp_disk(image: np.ndarray, center_y: int, center_x: int, radius: int, delta: float) -> None:
+    """
+    Add a constant to a filled disk of an image, in place.
+
+    Only the (2r+1)x(2r+1) window around the center is touched, instead of the full image.
+
+    Args:
+        image: 2D array to modify.
+        center_y: Row of the disk center.
+        center_x: Column of the disk center.
+        radius: Disk radius in pixels (inclusive).
+        delta: Value added to every pixel of the disk.
+    """
+    h, w = image.shape
+    y0, y1 = max(0, center_y - radius), min(h, center_y + radius + 1)
+    x0, x1 = max(0, center_x - radius), min(w, center_x + radius + 1)
+    yy, xx = np.ogrid[y0 - center_y:y1 - center_y, x0 - center_x:x1 - center_x]
+    local_mask = yy * yy + xx * xx <= radius * radius
+    image[y0:y1, x0:x1][local_mask] += delta
+
+
+def _inject_spots(liver_intensity: np.ndarray, mask: np.ndarray, rows: slice, cols: slice,
+                  rng: np.random.Generator, num_spots: int, radius_range: Tuple[int, int],
+                  delta_range: Tuple[float, float]) -> None:
+    """
+    Add bright disks at random positions inside the liver, in place.
+
+    All spot parameters are sampled in one batch; spots whose center falls outside the
+    mask are dropped before stamping.
+
+    Args:
+        liver_intensity: Liver values over the mask bounding box, modified in place.
+        mask: Full-image liver mask.
+        rows: Row slice of the bounding box.
+        cols: Column slice of the bounding box.
+        rng: Random number generator.
+        num_spots: Number of candidate spots.
+        radius_range: Half-open [low, high) range of spot radii in pixels.
+        delta_range: Range of intensity increments.
+    """
+    h, w = mask.shape
+    spot_ys = rng.integers(0, h, size=num_spots)
+    spot_xs = rng.integers(0, w, size=num_spots)
+    radii = rng.integers(*radius_range, size=num_spots)
+    deltas = rng.uniform(*delta_range, size=num_spots)
+
+    keep = mask[spot_ys, spot_xs]
+    for spot_y, spot_x, radius, delta in zip(spot_ys[keep], spot_xs[keep], radii[keep], deltas[keep]):
+        _stamp_disk(liver_intensity, spot_y - rows.start, spot_x - cols.start, radius, delta)
+
+
+def _normal_f32(rng: np.random.Generator, loc: float, scale: float, size: Tuple[int, ...]) -> np.ndarray:
+    """
+    Draw Gaussian noise directly as float32.
+
+    Args:
+        rng: Random number generator.
+        loc: Mean of the distribution.
+        scale: Standard deviation of the distribution.
+        size: Output shape.
+
+    Returns:
+        float32 array of samples.
+    """
+    samples = rng.standard_normal(size, dtype=np.float32)
+    samples *= scale
+    samples += loc
+    return samples
+
+
+def _gamma_f32(rng: np.random.Generator, shape: float, scale: float, size: Tuple[int, ...]) -> np.ndarray:
+    """
+    Draw Gamma-distributed noise directly as float32.
+
+    Args:
+        rng: Random number generator.
+        shape: Shape parameter of the distribution.
+        scale: Scale parameter of the distribution.
+        size: Output shape.
+
+    Returns:
+        float32 array of samples.
+    """
+    samples = rng.standard_gamma(shape, size, dtype=np.float32)
+    samples *= scale
+    return samples
+
+
+def get_patient_mask(patient_id: str, resolution: Tuple[int, int]) -> np.ndarray:
+    """
+    Build the liver mask of a patient at a given resolution.
+
+    The mask only depends on the patient anatomy and the resolution, so callers generating
+    several modalities can compute it once and pass it to each generator.
+
+    Args:
+        patient_id: Patient identifier.
+        resolution: (height, width) of the mask.
+
+    Returns:
+        2D boolean mask.
+    """
+    params = _get_patient_anatomy_params(patient_id, "anatomy")
+    return _create_elliptical_mask(resolution, params["center"], params["axes"], params["angle"])
+
+
+# -------------------- Helper: Composite Liver Into Background --------------------
+if NUMBA_AVAILABLE:
+    @njit(fastmath=True, inline="always")
+    def _composite_rows(image: np.ndarray, liver_intensity: np.ndarray, liver_mask: np.ndarray,
+                        y0: int, x0: int, h: int, w: int) -> None:
+        """
+        Shared body of the composite kernels: merge + clip over an (h, w) image.
+
+        Args:
+            image: Background image, modified in place.
+            liver_intensity: Liver values over the mask bounding box.
+            liver_mask: Mask over the bounding box.
+            y0: First row of the bounding box in the image.
+            x0: First column of the bounding box in the image.
+            h: Image height.
+            w: Image width.
+        """
+        bh, bw = liver_intensity.shape
+        for i in range(h):
+            li = i - y0
+            for j in range(w):
+                lj = j - x0
+                value = image[i, j]
+                if 0 <= li < bh and 0 <= lj < bw and liver_mask[li, lj]:
+                    value = liver_intensity[li, lj]
+                image[i, j] = min(max(value, 0.0), 1.0)
+
+    @njit(fastmath=True, cache=True)
+    def _composite_kernel(image: np.ndarray, liver_intensity: np.ndarray, liver_mask: np.ndarray,
+                          y0: int, x0: int) -> None:
+        """
+        Fused merge + clip in a single pass over the image (compiled with Numba).
+
+        Deliberately single-threaded: dataset generation already runs one worker process
+        per core, and a Numba thread pool in each worker would oversubscribe the CPU.
+
+        Args:
+            image: Background image, modified in place.
+            liver_intensity: Liver values over the mask bounding box.
+            liver_mask: Mask over the bounding box.
+            y0: First row of the bounding box in the image.
+            x0: First column of the bounding box in the image.
+        """
+        h, w = image.shape
+        _composite_rows(image, liver_intensity, liver_mask, y0, x0, h, w)
+
+    def _make_composite_kernel(h: int, w: int):
+        """
+        Build a _composite_kernel specialized for one image shape.
+
+        The shape is closed over and the shared body is inlined, so Numba compiles the
+        loop bounds as constants.
+
+        Args:
+            h: Image height.
+            w: Image width.
+
+        Returns:
+            Compiled kernel with the same signature as _composite_kernel, for (h, w) images only.
+        """
+        @njit(fastmath=True, cache=True)
+        def kernel(image: np.ndarray, liver_intensity: np.ndarray, liver_mask: np.ndarray,
+                   y0: int, x0: int) -> None:
+            _composite_rows(image, liver_intensity, liver_mask, y0, x0, h, w)
+
+        return kernel
+
+    # One specialized kernel per configured resolution (compiled lazily on first call)
+    _COMPOSITE_KERNELS = {resolution: _make_composite_kernel(*resolution) for resolution in IMAGE_RESOLUTIONS.values()}
+
+
+def _composite(image: np.ndarray, liver_intensity: np.ndarray, liver_mask: np.ndarray,
+               rows: slice, cols: slice) -> np.ndarray:
+    """
+    Write the liver values into the background where the mask is set, then clip to [0, 1].
+
+    Args:
+        image: Background image, modified in place.
+        liver_intensity: Liver values over the mask bounding box.
+        liver_mask: Mask over the bounding box.
+        rows: Row slice of the bounding box.
+        cols: Column slice of the bounding box.
+
+    Returns:
+        The composited image (same array as `image`).
+    """
+    if NUMBA_AVAILABLE:
+        # Shape-specialized kernel for configured resolutions, generic one otherwise
+        kernel = _COMPOSITE_KERNELS.get(image.shape, _composite_kernel)
+        kernel(image, liver_intensity, liver_mask, rows.start, cols.start)
+        return image
+
+    # Masked copy into the bounding-box view: no temporary, background is only read where needed
+    np.copyto(image[rows, cols], liver_intensity, where=liver_mask)
+    np.clip(image, 0, 1, out=image)
+    return image
+
+
 # -------------------- Modality Generators --------------------
-def generate_mri_image(patient_id: str, fibrosis_stage: str, resolution: Tuple[int, int]) -> np.ndarray:
+def generate_mri_image(patient_id: str, fibrosis_stage: str, resolution: Tuple[int, int],
+                       mask: Optional[np.ndarray] = None) -> np.ndarray:
     """
     Generate a synthetic MRI image of the liver.
 
@@ -94,6 +366,7 @@ def generate_mri_image(patient_id: str, fibrosis_stage: str, resolution: Tuple[i
         patient_id: Patient identifier.
         fibrosis_stage: One of F0-F4.
         resolution: (height, width) of the output image.
+        mask: Optional precomputed liver mask (see get_patient_mask); built here if omitted.
 
     Returns:
         2D float32 array with values in [0, 1].
@@ -103,40 +376,35 @@ def generate_mri_image(patient_id: str, fibrosis_stage: str, resolution: Tuple[i
     rng = params["rng"]  # Use same RNG for consistency
 
     # Create mask
-    mask = _create_elliptical_mask((h, w), params["center"], params["axes"], params["angle"])
+    if mask is None:
+        mask = _create_elliptical_mask((h, w), params["center"], params["axes"], params["angle"])
+
+    # Liver noise is only drawn over the bounding box of the mask
+    rows, cols = _mask_bbox(mask)
+    liver_mask = mask[rows, cols]
 
     # Background: low intensity with slight noise
-    background = rng.normal(loc=0.1, scale=0.02, size=(h, w)).clip(0, 1)
+    background = _normal_f32(rng, loc=0.1, scale=0.02, size=(h, w))
 
     # Liver region: base intensity modulated by fibrosis stage
     stage_index = FIBROSIS_STAGES.index(fibrosis_stage)
 
     # Base liver intensity increases with stage (more fibrotic = brighter on T2)
     liver_base = 0.5 + 0.1 * stage_index  # 0.5 to 0.9
-    liver_intensity = rng.normal(loc=liver_base, scale=0.05, size=(h, w))
+    liver_intensity = _normal_f32(rng, loc=liver_base, scale=0.05, size=liver_mask.shape)
 
     # Add texture: for higher stages, add random bright spots (nodules)
     if stage_index >= 2:  # F2 and above
         num_spots = rng.poisson(lam=5 + 3 * (stage_index - 2))
-        for _ in range(num_spots):
-            spot_y = rng.randint(0, h)
-            spot_x = rng.randint(0, w)
-            if mask[spot_y, spot_x]:
-                # Add a small bright disk
-                rr, cc = np.ogrid[:h, :w]
-                dist = np.sqrt((rr - spot_y) ** 2 + (cc - spot_x) ** 2)
-                spot_mask = dist <= rng.randint(3, 8)
-                liver_intensity[spot_mask] += rng.uniform(0.2, 0.4)
-
-    # Combine: where mask is True, use liver_intensity; else background
-    image = np.where(mask, liver_intensity, background)
-
-    # Ensure [0,1] range
-    image = np.clip(image, 0, 1).astype(np.float32)
+        _inject_spots(liver_intensity, mask, rows, cols, rng, num_spots, (3, 8), (0.2, 0.4))
+
+    # Combine: where mask is True, use liver_intensity; else background, clipped to [0,1]
+    image = _composite(background, liver_intensity, liver_mask, rows, cols)
     return image
 
 
-def generate_ct_image(patient_id: str, fibrosis_stage: str, resolution: Tuple[int, int]) -> np.ndarray:
+def generate_ct_image(patient_id: str, fibrosis_stage: str, resolution: Tuple[int, int],
+                      mask: Optional[np.ndarray] = None) -> np.ndarray:
     """
     Generate a synthetic CT image of the liver (simulated Hounsfield units normalized to [0,1]).
 
@@ -144,6 +412,7 @@ def generate_ct_image(patient_id: str, fibrosis_stage: str, resolution: Tuple[in
         patient_id: Patient identifier.
         fibrosis_stage: One of F0-F4.
         resolution: (height, width) of the output image.
+        mask: Optional precomputed liver mask (see get_patient_mask); built here if omitted.
 
     Returns:
         2D float32 array with values in [0, 1].
@@ -152,10 +421,15 @@ def generate_ct_image(patient_id: str, fibrosis_stage: str, resolution: Tuple[in
     params = _get_patient_anatomy_params(patient_id, "CT")
     rng = params["rng"]
 
-    mask = _create_elliptical_mask((h, w), params["center"], params["axes"], params["angle"])
+    if mask is None:
+        mask = _create_elliptical_mask((h, w), params["center"], params["axes"], params["angle"])
+
+    # Liver noise is only drawn over the bounding box of the mask
+    rows, cols = _mask_bbox(mask)
+    liver_mask = mask[rows, cols]
 
     # Background (air) low, some noise
-    background = rng.normal(loc=0.05, scale=0.01, size=(h, w)).clip(0, 1)
+    background = _normal_f32(rng, loc=0.05, scale=0.01, size=(h, w))
 
     # Liver CT: typical HU ~50-60, but we normalize to [0,1] where 0~ -1000, 1~ +1000.
     # We'll map: 0 -> -1000, 1 -> +1000. So liver around 0.5 corresponds to 0 HU? Let's just use [0,1] directly.
@@ -163,26 +437,19 @@ def generate_ct_image(patient_id: str, fibrosis_stage: str, resolution: Tuple[in
 
     # Liver mean intensity increases slightly with fibrosis (more dense)
     liver_mean = 0.5 + 0.05 * stage_index
-    liver_intensity = rng.normal(loc=liver_mean, scale=0.02, size=(h, w))
+    liver_intensity = _normal_f32(rng, loc=liver_mean, scale=0.02, size=liver_mask.shape)
 
     # For advanced stages, add some high-density spots (calcifications)
     if stage_index >= 3:  # F3, F4
         num_spots = rng.poisson(lam=3)
-        for _ in range(num_spots):
-            spot_y = rng.randint(0, h)
-            spot_x = rng.randint(0, w)
-            if mask[spot_y, spot_x]:
-                rr, cc = np.ogrid[:h, :w]
-                dist = np.sqrt((rr - spot_y) ** 2 + (cc - spot_x) ** 2)
-                spot_mask = dist <= rng.randint(2, 5)
-                liver_intensity[spot_mask] += rng.uniform(0.3, 0.6)
-
-    image = np.where(mask, liver_intensity, background)
-    image = np.clip(image, 0, 1).astype(np.float32)
+        _inject_spots(liver_intensity, mask, rows, cols, rng, num_spots, (2, 5), (0.3, 0.6))
+
+    image = _composite(background, liver_intensity, liver_mask, rows, cols)
     return image
 
 
-def generate_ultrasound_image(patient_id: str, fibrosis_stage: str, resolution: Tuple[int, int]) -> np.ndarray:
+def generate_ultrasound_image(patient_id: str, fibrosis_stage: str, resolution: Tuple[int, int],
+                              mask: Optional[np.ndarray] = None) -> np.ndarray:
     """
     Generate a synthetic ultrasound image of the liver with speckle noise.
 
@@ -190,6 +457,7 @@ def generate_ultrasound_image(patient_id: str, fibrosis_stage: str, resolution:
         patient_id: Patient identifier.
         fibrosis_stage: One of F0-F4.
         resolution: (height, width) of the output image.
+        mask: Optional precomputed liver mask (see get_patient_mask); built here if omitted.
 
     Returns:
         2D float32 array with values in [0, 1].
@@ -198,10 +466,15 @@ def generate_ultrasound_image(patient_id: str, fibrosis_stage: str, resolution:
     params = _get_patient_anatomy_params(patient_id, "Ultrasound")
     rng = params["rng"]
 
-    mask = _create_elliptical_mask((h, w), params["center"], params["axes"], params["angle"])
+    if mask is None:
+        mask = _create_elliptical_mask((h, w), params["center"], params["axes"], params["angle"])
+
+    # Liver noise is only drawn over the bounding box of the mask
+    rows, cols = _mask_bbox(mask)
+    liver_mask = mask[rows, cols]
 
     # Background (anechoic) low
-    background = rng.gamma(shape=1, scale=0.01, size=(h, w)).clip(0, 1)
+    background = _gamma_f32(rng, shape=1, scale=0.01, size=(h, w))
 
     # Liver parenchyma: speckle noise modelled as Gamma or Rayleigh.
     # For simplicity, use Gamma with shape and scale.
@@ -210,21 +483,13 @@ def generate_ultrasound_image(patient_id: str, fibrosis_stage: str, resolution:
     # More fibrosis -> higher echogenicity (brighter) and coarser texture (higher shape parameter)
     shape = 2.0 + 1.0 * stage_index  # 2 to 6
     scale = 0.1 + 0.02 * stage_index  # scale increases brightness
-    liver_intensity = rng.gamma(shape=shape, scale=scale, size=(h, w))
+    liver_intensity = _gamma_f32(rng, shape=shape, scale=scale, size=liver_mask.shape)
 
     # Add some bright reflections for advanced stages
     if stage_index >= 2:
         num_spots = rng.poisson(lam=8)
-        for _ in range(num_spots):
-            spot_y = rng.randint(0, h)
-            spot_x = rng.randint(0, w)
-            if mask[spot_y, spot_x]:
-                rr, cc = np.ogrid[:h, :w]
-                dist = np.sqrt((rr - spot_y) ** 2 + (cc - spot_x) ** 2)
-                spot_mask = dist <= rng.randint(2, 4)
-                liver_intensity[spot_mask] += rng.uniform(0.5, 1.0)
-
-    image = np.where(mask, liver_intensity, background)
+        _inject_spots(liver_intensity, mask, rows, cols, rng, num_spots, (2, 4), (0.5, 1.0))
+
     # Normalize to [0,1] by clipping
-    image = np.clip(image, 0, 1).astype(np.float32)
+    image = _composite(background, liver_intensity, liver_mask, rows, cols)
     return image
\ No newline at end of file
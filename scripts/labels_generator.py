@@ -9,7 +9,7 @@ from config import (
     BINARY_LABEL_MAPPING,
     SPLIT_RATIOS
 )
-from utils import get_patient_id, assign_split
+from utils import get_patient_id, assign_split, assign_splits_vectorized
 
 # -------------------- Constants for Metadata --------------------
 AGE_MEAN: float = 60.0
@@ -25,7 +25,7 @@ FIBROSIS_PROBS: List[float] = [0.30, 0.25, 0.20, 0.15, 0.10]  # F0 to F4
 
 
 # -------------------- Patient-Level Label Generation --------------------
-def generate_patient_labels(patient_index: int, rng: np.random.RandomState) -> Dict[str, object]:
+def generate_patient_labels(patient_index: int, rng: np.random.Generator) -> Dict[str, object]:
     """
     Generate labels and metadata for a single patient.
 
@@ -84,20 +84,37 @@ def generate_all_labels(num_patients: int = NUM_PATIENTS, seed: int = RANDOM_SEE
     Returns:
         DataFrame with columns: patient_id, fibrosis_stage, binary_label, split, age, sex.
     """
-    # Create a global random number generator
-    rng = np.random.RandomState(seed)
-
-    records = []
-    for idx in range(num_patients):
-        # Use a per-patient RNG seeded from the global one to ensure deterministic but independent sampling
-        # This avoids sequence dependence if we later shuffle or process in parallel.
-        # Ensure the seed is within the valid range for RandomState (0 to 2**31-1 for signed 32-bit).
-        patient_seed = rng.randint(0, 2**31 - 1)
-        patient_rng = np.random.RandomState(patient_seed)
-        record = generate_patient_labels(idx, patient_rng)
-        records.append(record)
-
-    df = pd.DataFrame(records)
+    # Single generator: every column is sampled in bulk instead of per patient
+    rng = np.random.default_rng(seed)
+
+    patient_ids = [get_patient_id(idx) for idx in range(num_patients)]
+
+    # Sample fibrosis stages according to predefined probabilities
+    stage_indices = rng.choice(len(FIBROSIS_STAGES), size=num_patients, p=FIBROSIS_PROBS)
+    fibrosis_stages = np.array(FIBROSIS_STAGES)[stage_indices]
+
+    # Determine binary labels based on mapping
+    is_positive = np.isin(fibrosis_stages, BINARY_LABEL_MAPPING["positive"])
+    binary_labels = np.where(is_positive, "positive", "negative")
+
+    # Assign data splits based on index (using global SPLIT_RATIOS)
+    splits = assign_splits_vectorized(num_patients, SPLIT_RATIOS)
+
+    # Generate ages (normal distribution, clipped to realistic range)
+    ages = np.clip(np.round(rng.normal(AGE_MEAN, AGE_STD, size=num_patients)), AGE_MIN, AGE_MAX).astype(int)
+
+    # Generate sexes
+    sexes = rng.choice(SEX_OPTIONS, size=num_patients, p=SEX_PROBS)
+
+    # Finite-valued columns are stored as categoricals (compact, fast equality filters)
+    df = pd.DataFrame({
+        "patient_id": patient_ids,
+        "fibrosis_stage": pd.Categorical(fibrosis_stages, categories=FIBROSIS_STAGES, ordered=True),
+        "binary_label": pd.Categorical(binary_labels, categories=list(BINARY_LABEL_MAPPING.keys())),
+        "split": pd.Categorical(splits, categories=list(SPLIT_RATIOS.keys())),
+        "age": ages,
+        "sex": pd.Categorical(sexes, categories=SEX_OPTIONS),
+    })
     return df
 
 
@@ -1,10 +1,18 @@
+import hashlib
 import os
 import random
+import shutil
 import numpy as np
 import pandas as pd
-from typing import Any, Dict, List, Optional, Union
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
 from numpy.typing import NDArray
 
+try:
+    import polars as pl
+    POLARS_AVAILABLE = True
+except ImportError:  # Polars is optional: fall back to the pandas CSV writer
+    POLARS_AVAILABLE = False
+
 
 # -------------------- File System Utilities --------------------
 def ensure_directory(path: str) -> None:
@@ -46,6 +54,24 @@ def get_image_filename(patient_id: str, modality: str, extension: str = ".npy")
     return f"{patient_id}_{modality}{extension}"
 
 
+def get_image_filenames(patient_ids: Sequence[str], modalities: Sequence[str], extension: str = ".npy") -> NDArray[Any]:
+    """
+    Generate the filenames of every (patient, modality) pair in one vectorized pass.
+
+    Args:
+        patient_ids: Patient identifiers.
+        modalities: Imaging modalities.
+        extension: File extension including the dot.
+
+    Returns:
+        String array of shape (len(patient_ids), len(modalities)); entry [i, j] equals
+        get_image_filename(patient_ids[i], modalities[j], extension).
+    """
+    prefixes = np.char.add(np.asarray(patient_ids, dtype=str)[:, None], "_")
+    suffixes = np.char.add(np.asarray(modalities, dtype=str), extension)
+    return np.char.add(prefixes, suffixes[None, :])
+
+
 def get_image_path(patient_id: str, modality: str, base_dir: str, images_subdir: str = "images",
                    extension: str = ".npy") -> str:
     """
@@ -64,6 +90,22 @@ def get_image_path(patient_id: str, modality: str, base_dir: str, images_subdir:
     return os.path.join(base_dir, images_subdir, get_image_filename(patient_id, modality, extension))
 
 
+def get_stack_path(modality: str, base_dir: str, images_subdir: str = "images", extension: str = ".npy") -> str:
+    """
+    Construct the full path to the image stack of a modality.
+
+    Args:
+        modality: Imaging modality.
+        base_dir: Root dataset directory.
+        images_subdir: Subdirectory where images are stored.
+        extension: File extension.
+
+    Returns:
+        Full path to the stack file, e.g., "<base_dir>/images/MRI.npy".
+    """
+    return os.path.join(base_dir, images_subdir, f"{modality}{extension}")
+
+
 # -------------------- Random Seed Utilities --------------------
 def set_global_seed(seed: int) -> None:
     """
@@ -83,12 +125,28 @@ def save_image(array: NDArray[Any], filepath: str) -> None:
     """
     Save a NumPy array as a .npy file.
 
+    As with np.save, a ".npy" extension is appended to the path if it does not already
+    have one. The file is written under a temporary name and then renamed over the
+    destination, so readers never see a partial file and an existing destination (possibly
+    a hard link into the image cache) is replaced rather than overwritten in place.
+
     Args:
         array: Image data as a NumPy array.
         filepath: Destination file path.
     """
+    if not filepath.endswith(".npy"):
+        filepath += ".npy"
     ensure_directory(os.path.dirname(filepath))
-    np.save(filepath, array)
+    tmp_path = f"{filepath}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            np.save(f, array)
+        os.replace(tmp_path, filepath)
+    except BaseException:
+        # Do not leave a partial temporary file behind (e.g. disk full)
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
 
 
 def load_image(filepath: str) -> NDArray[Any]:
@@ -104,16 +162,156 @@ def load_image(filepath: str) -> NDArray[Any]:
     return np.load(filepath)
 
 
+def create_image_stack(filepath: str, num_images: int, resolution: Tuple[int, int]) -> NDArray[Any]:
+    """
+    Create a memory-mapped float32 .npy stack of images, to be filled slice by slice.
+
+    Args:
+        filepath: Destination file path.
+        num_images: Number of images in the stack.
+        resolution: (height, width) of each image.
+
+    Returns:
+        Writable memory-mapped array of shape (num_images, height, width).
+    """
+    ensure_directory(os.path.dirname(filepath))
+    return np.lib.format.open_memmap(filepath, mode="w+", dtype=np.float32, shape=(num_images, *resolution))
+
+
+def load_image_stack(filepath: str, mode: str = "r") -> NDArray[Any]:
+    """
+    Memory-map an image stack without reading it into memory.
+
+    Args:
+        filepath: Path to the stack .npy file.
+        mode: Memory-map mode ("r" for read-only, "r+" to write slices in place).
+
+    Returns:
+        Memory-mapped array of shape (num_images, height, width).
+    """
+    return np.load(filepath, mmap_mode=mode)
+
+
+def load_stacked_image(patient_index: int, modality: str, base_dir: str, images_subdir: str = "images") -> NDArray[Any]:
+    """
+    Load a single patient's image from the stack of a modality.
+
+    Args:
+        patient_index: Row of the patient in the stack (see the manifest CSV).
+        modality: Imaging modality.
+        base_dir: Root dataset directory.
+        images_subdir: Subdirectory where images are stored.
+
+    Returns:
+        2D image array.
+    """
+    stack = load_image_stack(get_stack_path(modality, base_dir, images_subdir))
+    return np.array(stack[patient_index])
+
+
+# -------------------- Image Cache Utilities --------------------
+def get_image_cache_key(patient_id: str, modality: str, fibrosis_stage: str, resolution: Tuple[int, int],
+                        anatomy_resolution: Tuple[int, int], version: str) -> str:
+    """
+    Content key of a generated image: everything the generated pixels depend on.
+
+    The NumPy major.minor version is part of the key, since NumPy does not guarantee that
+    Generator streams (standard_normal, standard_gamma, ...) stay the same across releases.
+
+    Args:
+        patient_id: Patient identifier.
+        modality: Imaging modality.
+        fibrosis_stage: One of F0-F4.
+        resolution: (height, width) of the image.
+        anatomy_resolution: (height, width) in which the patient anatomy is sampled.
+        version: Version of the image generators.
+
+    Returns:
+        32-character hexadecimal key.
+    """
+    numpy_version = ".".join(np.__version__.split(".")[:2])
+    key_str = (f"{patient_id}|{modality}|{fibrosis_stage}|{resolution[0]}x{resolution[1]}"
+               f"|{anatomy_resolution[0]}x{anatomy_resolution[1]}|{version}|numpy{numpy_version}")
+    return hashlib.blake2b(key_str.encode(), digest_size=16).hexdigest()
+
+
+def touch_cached_image(cache_path: str) -> None:
+    """
+    Mark a cached image as recently used (eviction is by modification time).
+
+    Args:
+        cache_path: Path of the cached image.
+    """
+    os.utime(cache_path)
+
+
+def link_or_copy(src: str, dst: str) -> None:
+    """
+    Hard-link a file to a new path, copying it when linking is not possible.
+
+    Args:
+        src: Existing file.
+        dst: Destination path (replaced if it exists).
+    """
+    ensure_directory(os.path.dirname(dst))
+    if os.path.lexists(dst):
+        os.remove(dst)
+    try:
+        os.link(src, dst)
+    except OSError:  # Cross-device or unsupported filesystem
+        shutil.copyfile(src, dst)
+
+
+def evict_image_cache(cache_dir: str, max_bytes: int) -> int:
+    """
+    Delete the least recently used cached images until the cache fits in the budget.
+
+    Temporary files left by interrupted writes count against the budget too, and being
+    never touched, they are among the first to go.
+
+    Args:
+        cache_dir: Cache directory.
+        max_bytes: Size budget in bytes.
+
+    Returns:
+        Number of evicted files.
+    """
+    entries = []
+    with os.scandir(cache_dir) as it:
+        for entry in it:
+            if entry.is_file() and entry.name.endswith((".npy", ".tmp")):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+    total = sum(size for _, size, _ in entries)
+    evicted = 0
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        os.remove(path)
+        total -= size
+        evicted += 1
+    return evicted
+
+
 # -------------------- Metadata I/O Utilities --------------------
 def save_labels(dataframe: pd.DataFrame, filepath: str) -> None:
     """
-    Save a pandas DataFrame to a CSV file.
+    Save a pandas DataFrame to a CSV file (index not written).
+
+    Uses the multi-threaded Polars writer when available, otherwise pandas.
 
     Args:
         dataframe: DataFrame containing labels/metadata.
         filepath: Destination CSV file path.
     """
     ensure_directory(os.path.dirname(filepath))
+    if POLARS_AVAILABLE:
+        try:
+            pl.from_pandas(dataframe).write_csv(filepath)
+            return
+        except ImportError:  # Converting non-NumPy-backed columns also requires pyarrow
+            pass
     dataframe.to_csv(filepath, index=False)
 
 
@@ -131,17 +329,19 @@ def load_labels(filepath: str) -> pd.DataFrame:
 
 
 # -------------------- Data Splitting Utilities --------------------
-def assign_split(patient_index: int, num_patients: int, split_ratios: Dict[str, float]) -> str:
+def _split_indices(positions: NDArray[Any], split_ratios: Dict[str, float]) -> NDArray[Any]:
     """
-    Deterministically assign a patient to a split based on index and ratios.
+    Index of the split each normalized position falls into.
+
+    A position goes to the first split whose cumulative ratio is >= the position; positions
+    past the last threshold (floating point) fall back to the last split.
 
     Args:
-        patient_index: Integer index of the patient (0-based).
-        num_patients: Total number of patients.
+        positions: Normalized patient positions, (patient_index + 1) / num_patients.
         split_ratios: Dictionary mapping split names to fractions (sum=1).
 
     Returns:
-        Name of the split (e.g., "train", "val", "test").
+        Array of split indices into split_ratios, same shape as positions.
 
     Raises:
         ValueError: If split ratios do not sum to 1.
@@ -149,19 +349,48 @@ def assign_split(patient_index: int, num_patients: int, split_ratios: Dict[str,
     if not np.isclose(sum(split_ratios.values()), 1.0):
         raise ValueError(f"Split ratios must sum to 1.0, got {sum(split_ratios.values())}")
 
-    # Compute cumulative thresholds
-    cumulative = 0.0
-    boundaries = []
-    for split, ratio in split_ratios.items():
-        cumulative += ratio
-        boundaries.append((split, cumulative))
+    thresholds = np.cumsum(list(split_ratios.values()))
+    indices = np.searchsorted(thresholds, positions, side="left")
+    return np.minimum(indices, len(thresholds) - 1)
 
-    # Normalized position of this patient (ensure last patient falls into last split)
-    position = (patient_index + 1) / num_patients  # +1 to avoid 0 at start
 
-    for split, threshold in boundaries:
-        if position <= threshold:
-            return split
+def assign_splits_vectorized(num_patients: int, split_ratios: Dict[str, float]) -> NDArray[Any]:
+    """
+    Deterministically assign every patient to a split based on index and ratios.
+
+    Same rule as assign_split, evaluated for all patients at once.
+
+    Args:
+        num_patients: Total number of patients.
+        split_ratios: Dictionary mapping split names to fractions (sum=1).
+
+    Returns:
+        Array of length num_patients with the split name of each patient.
+
+    Raises:
+        ValueError: If split ratios do not sum to 1.
+    """
+    # Normalized position of each patient (+1 so that the last patient lands on 1.0)
+    positions = (np.arange(num_patients) + 1) / num_patients
+    return np.array(list(split_ratios.keys()))[_split_indices(positions, split_ratios)]
+
+
+def assign_split(patient_index: int, num_patients: int, split_ratios: Dict[str, float]) -> str:
+    """
+    Deterministically assign a patient to a split based on index and ratios.
+
+    Prefer assign_splits_vectorized when assigning many patients.
+
+    Args:
+        patient_index: Integer index of the patient (0-based).
+        num_patients: Total number of patients.
+        split_ratios: Dictionary mapping split names to fractions (sum=1).
 
-    # Fallback (should not happen due to floating point)
-    return list(split_ratios.keys())[-1]
\ No newline at end of file
+    Returns:
+        Name of the split (e.g., "train", "val", "test").
+
+    Raises:
+        ValueError: If split ratios do not sum to 1.
+    """
+    position = (patient_index + 1) / num_patients  # +1 to avoid 0 at start
+    return list(split_ratios.keys())[int(_split_indices(position, split_ratios))]